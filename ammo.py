@@ -15,41 +15,119 @@ References:
 
 # Built-In Libraries
 import argparse
-from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+import json
+import math
 import os
+import random
 import sys
+import tempfile
+import time
+from types import MappingProxyType
 
 # External Libraries
-import mock_ammo
 import requests
-import spotipy
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+
+# The longest time to wait before retrying a rate limited request.
+_MAX_RETRY_AFTER = 60
+
+
+# A persistent session shared with Spotipy, so every request to the Spotify
+# API can reuse the same pooled connections. Only connections that failed to
+# open are retried here, as those requests never reached Spotify; rate limits
+# and server errors are left to retry_spotify_request, so there is only one
+# layer of retries.
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=10,
+    max_retries=Retry(
+        total=2,
+        read=0,
+        backoff_factor=0.3,
+        respect_retry_after_header=False)))
+
+# A session for checking the Spotify API can be reached, which never retries
+# so that the check takes no longer than its timeout.
+_PROBE_SESSION = requests.Session()
+_PROBE_SESSION.mount('https://', HTTPAdapter(max_retries=0))
+
+# Map error status codes to their corresponding descriptions.
+_STATUS_ERRORS = MappingProxyType({
+    400: 'Bad Request: The request could not be understood or was missing required parameters.',
+    401: 'Unauthorized: Authentication failed or user does not have permissions for the requested operation.',
+    403: 'Forbidden: Authentication succeeded, but the authenticated user does not have access to the requested resource.',
+    404: 'Not Found: The requested resource could not be found.',
+    429: 'Too Many Requests: The user has sent too many requests in a given amount of time.',
+    500: 'Internal Server Error: An error occurred on the server.',
+    502: 'Bad Gateway: The server was acting as a gateway or proxy and received an invalid response from the upstream server.',
+    503: 'Service Unavailable: The server is currently unavailable (because it is overloaded or down for maintenance).'
+})
+
+# Where data is kept between runs, such as the user's access token.
+CACHE_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'ammo')
+TOKEN_CACHE_PATH = os.path.join(CACHE_DIRECTORY, 'token.json')
+
+# The end of every playlist's description, after the month it covers.
+_DESCRIPTION_SUFFIX = ('. Auto-generated with AMMO. Visit '
+                       'https://github.com/JayMassey98 for more information.')
+
+# Month names for playlist names, so they don't depend on the system locale.
+_MONTHS_SHORT = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+                 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+_MONTHS_LONG = ('January', 'February', 'March', 'April', 'May', 'June', 'July',
+                'August', 'September', 'October', 'November', 'December')
+
+
+def get_missing_environment_variables():
+    """Get any environment variables required for the Spotipy library that are
+    not set, without prompting the user for them.
 
+    Returns:
+        missing_variables: A dictionary of each missing variable's prompt.
+    """
 
-def set_environment_variables():
-    """Set environment variables required for the Spotipy library."""
-    
     # All the required Spotipy environment variables.
     environment_variables = {
         'SPOTIPY_CLIENT_ID': 'Client ID: ',
         'SPOTIPY_CLIENT_SECRET': 'Client Secret: ',
         'SPOTIPY_REDIRECT_URI': 'Redirect URI: '
     }
-    
-    # Ensure all the Spotipy environment variables are set.
-    missing_variables = [variable for variable,
+
+    # Find which of the Spotipy environment variables are not set.
+    missing_variables = {variable: prompt for variable,
                          prompt in environment_variables.items()
-                         if not os.environ.get(variable)]
-    if missing_variables:
-        print('Please input the required items below.\n')
-    
-    # Set any missing Spotipy environment variables.
-    for variable, prompt in environment_variables.items():
-        if not os.environ.get(variable):
+                         if not os.environ.get(variable)}
+
+    return missing_variables
+
+
+def set_environment_variables():
+    """Set environment variables required for the Spotipy library."""
+
+    # Ensure all the Spotipy environment variables are set.
+    missing_variables = get_missing_environment_variables()
+    if not missing_variables:
+        return
+    print('Please input the required items below.\n')
+
+    # Set any missing Spotipy environment variables, halting if there is no
+    # input to read them from (such as in a scheduled task).
+    for variable, prompt in missing_variables.items():
+        try:
             os.environ[variable] = input(prompt)
+        except EOFError:
+            print(f'\nError: {variable} must be set when there is no input.')
+            sys.exit(1)
 
     # For better script spacing.
-    if missing_variables:
-        print()
+    print()
 
 
 def get_optional_arguments():
@@ -64,20 +142,19 @@ def get_optional_arguments():
     parser.add_argument('-d',
                         '--dry_run',
                         help='Determines if the Spotify API should be mocked.',
-                        type=bool,
-                        default=False)
+                        action='store_true')
     parser.add_argument('-m',
                         '--month_format',
                         help=('Determines how months are displayed in ' +
                               'generated playlists.'),
                         type=str,
+                        choices=('short', 'long'),
                         default='short')
     parser.add_argument('-c',
                         '--copies_allowed',
                         help=('Determines if a playlist should be generated ' +
                               'if one with the same name already exists.'),
-                        type=bool,
-                        default=False)
+                        action='store_true')
     parser.add_argument('-t',
                         '--tracks_total',
                         help=('Determines the total number of tracks to use ' +
@@ -85,68 +162,76 @@ def get_optional_arguments():
                         type=int,
                         default=50)
     parser.add_argument('-p',
-                        '--playlist_public',
-                        help='Determines if a playlist should be public.',
-                        type=bool,
-                        default=True)
+                        '--playlist_private',
+                        help='Determines if a playlist should be private.',
+                        action='store_false',
+                        dest='playlist_public')
+    parser.add_argument('-f',
+                        '--force_refresh',
+                        help=('Determines if cached playlist names should ' +
+                              'be ignored and fetched from Spotify again.'),
+                        action='store_true')
     args = parser.parse_args()
 
+    # Reject an invalid number of tracks before any requests are made.
+    if not 1 <= args.tracks_total <= 50:
+        parser.error('argument -t/--tracks_total: must be between 1 and 50')
+
     return args
 
 
-def check_connection(url, dry_run=False):
+def check_connection(url, dry_run=False, attempts=3):
     """Check if a supplied URL is reachable. If the URL cannot be reached, then
     the resulting error description will be printed and the script will halt.
 
     Args:
         url: The URL that the program will establish a connection with.
         dry_run: A boolean determining if external API should be mocked.
+        attempts: The number of times to try the URL while it is rate limited.
     """
     
     # Don't attempt a real connection for dry runs.
     if dry_run:
-        print('Secured a ' + url + ' link.')
+        print(f'Secured a {url} link.')
         return
     
-    # Map status codes to their corresponding descriptions or boolean values.
-    status_codes = {
-        200: True,  # OK: The request was successful.
-        201: True,  # Created: The request was successful and a resource was created.
-        204: True,  # No Content: The request was successful but there is no representation to return.
-        400: 'Bad Request: The request could not be understood or was missing required parameters.',
-        401: 'Unauthorized: Authentication failed or user does not have permissions for the requested operation.',
-        403: 'Forbidden: Authentication succeeded, but the authenticated user does not have access to the requested resource.',
-        404: 'Not Found: The requested resource could not be found.',
-        429: 'Too Many Requests: The user has sent too many requests in a given amount of time.',
-        500: 'Internal Server Error: An error occurred on the server.',
-        502: 'Bad Gateway: The server was acting as a gateway or proxy and received an invalid response from the upstream server.',
-        503: 'Service Unavailable: The server is currently unavailable (because it is overloaded or down for maintenance).'
-    }
-
-    # Try to make a GET request to the URL.
+    # Try to make a HEAD request to the URL, as only the status is needed.
     try:
         
-        # Get the description for the status code.
-        response = requests.get(url)
-        status = status_codes.get(response.status_code)
-
-        # If there is no description, tell the user and return.
-        if status == True:
-            print('Secured a ' + url + ' link.')
+        # Wait for as long as the URL asks and try again if rate limited.
+        for attempt in range(attempts):
+            response = _PROBE_SESSION.head(url, allow_redirects=True,
+                                            timeout=(3, 5))
+            if response.status_code != 429 or attempt == attempts - 1:
+                break
+            time.sleep(min(get_retry_after(response), _MAX_RETRY_AFTER)
+                       + random.random())
+
+        # Get the description for the status code, if it is an error.
+        status_error = _STATUS_ERRORS.get(response.status_code)
+
+        # If there is no error, tell the user and return.
+        if status_error is None and response.ok:
+            print(f'Secured a {url} link.')
             return
 
-        # If the status is a string, print the string.
-        if isinstance(status, str):
-            print(status)
+        # Print the error, even if it has no description.
+        print(status_error or f'Error: Received a {response.status_code} '
+              f'status code when attempting to reach {url}.')
+
+    # Catch the request taking too long, so the script never hangs.
+    except requests.exceptions.Timeout:
+        print(f'Error: Timed out when attempting to reach {url}.')
 
-    # Catch any exceptions that might occur while making the GET request.
+    # Catch any exceptions that might occur while making the HEAD request.
     except requests.exceptions.RequestException:
-        print('Error: An unknown error occurred when attempting to reach ' + url + '.')
+        print(f'Error: An unknown error occurred when attempting to reach {url}.')
 
     # No connection found; exit the script.
     sys.exit(1)
 
 
+@lru_cache(maxsize=2)
 def get_spotify_data(dry_run=False):
     """Authenticate a user's Spotify credentials to allow data requests.
     
@@ -154,80 +239,240 @@ def get_spotify_data(dry_run=False):
         dry_run: A boolean determining if external API should be mocked.
     
     Returns:
-        spotify_data: A Spotify object containing a user's Spotify data.
+        spotify_data: A Spotify object containing a user's Spotify data, which
+            is reused by later calls with the same dry_run value.
     """
     
     # Detach Spotipy on dry runs.
     if dry_run:
+        # The mocks are only needed here, so only import them when dry running.
+        import mock_ammo
         SpotifyOAuth = mock_ammo.mock_SpotifyOAuth
         Spotify = mock_ammo.mock_Spotify
+        cache_handler = None
     else:
+        # Spotipy is slow to import, so only do so when it is needed.
+        import spotipy
         SpotifyOAuth = spotipy.SpotifyOAuth
         Spotify = spotipy.Spotify
 
+        # Keep the access token in one place, so any folder can reuse it.
+        os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+        cache_handler = spotipy.CacheFileHandler(cache_path=TOKEN_CACHE_PATH)
+
     # Supply the required scopes and retrieve the data.
     auth_manager = SpotifyOAuth(scope='user-top-read '
                                 + 'playlist-modify-public '
-                                + 'playlist-modify-private')
-    spotify_data = Spotify(auth_manager=auth_manager)
+                                + 'playlist-modify-private',
+                                cache_handler=cache_handler)
+    spotify_data = Spotify(auth_manager=auth_manager,
+                           requests_session=_SESSION)
 
     return spotify_data
 
 
-def generate_playlist_name(ending_date=None, month_format='short'):
-    """Generate the name of a playlist based on the date supplied.
+def get_retry_after(error):
+    """Get how long a rate limited request asked to wait before retrying.
+
+    Args:
+        error: The exception raised by the rate limited request, or its
+            response.
+
+    Returns:
+        retry_after: The number of seconds to wait, defaulting to one second
+            if the Retry-After header is missing or cannot be read.
+    """
+
+    # The header can be absent, a number of seconds, or a HTTP date.
+    retry_after = (getattr(error, 'headers', None) or {}).get('Retry-After')
+    try:
+        seconds = float(retry_after)
+    except (TypeError, ValueError):
+        pass
+    else:
+        return max(seconds, 0) if math.isfinite(seconds) else 1
+    try:
+        retry_date = parsedate_to_datetime(retry_after)
+        return max((retry_date - datetime.now(timezone.utc)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return 1
+
+
+def retry_spotify_request(request, *args, attempts=6, server_errors=True,
+                          **kwargs):
+    """Make a Spotify API request, retrying it if it is rate limited or if the
+    Spotify API is temporarily unavailable.
+
+    Args:
+        request: A Spotipy function that makes a request to the Spotify API.
+        attempts: The maximum number of times that the request will be made.
+        server_errors: A boolean determining if server errors are retried,
+            which should be False for writes that may have already happened.
+        *args: Any positional arguments to supply to the request.
+        **kwargs: Any keyword arguments to supply to the request.
+
+    Returns:
+        response: The response returned by the request.
+    """
+
+    # Rate limited requests were never processed, so are always safe to retry.
+    retry_statuses = (429, 502, 503, 504) if server_errors else (429,)
+
+    # Retry rate limits and server errors, backing off further each time.
+    for attempt in range(attempts):
+        try:
+            return request(*args, **kwargs)
+        except Exception as error:
+
+            # Only Spotipy's exceptions have a HTTP status to check.
+            http_status = getattr(error, 'http_status', None)
+            if http_status not in retry_statuses or attempt == attempts - 1:
+                raise
+
+            # Wait for as long as Spotify asks, or back off with some jitter.
+            if http_status == 429:
+                retry_after = get_retry_after(error)
+                time.sleep(min(retry_after * 1.5 ** attempt, _MAX_RETRY_AFTER))
+            else:
+                time.sleep(2 ** attempt + random.random())
+
+
+def generate_playlist_date(ending_date=None):
+    """Generate the date of a playlist, a month before the date supplied.
 
     Args:
         ending_date: The end date that the function is being run for.
-        month_format: A string that chooses how to display the month.
 
     Returns:
-        playlist_name: A string that is a month prior to ending_date.
+        playlist_date: The last day of the month prior to ending_date.
     """
 
     # Determine the current date.
     if not ending_date:
         ending_date = date.today()
-    month = ending_date.month
-    year = ending_date.year
 
-    # Use the above to calculate the playlist's start date and name.
-    if month == 1:
-        playlist_date = ending_date.replace(year=year-1, month=12)
-    else:
-        playlist_date = ending_date.replace(month=month-1)
+    # Step back to the last day of the previous month, valid for any day.
+    playlist_date = ending_date.replace(day=1) - timedelta(days=1)
+
+    return playlist_date
+
+
+def generate_playlist_name(ending_date=None, month_format='short',
+                           playlist_date=None):
+    """Generate the name of a playlist based on the date supplied.
+
+    Args:
+        ending_date: The end date that the function is being run for.
+        month_format: A string that chooses how to display the month.
+        playlist_date: The playlist's date, used instead of ending_date if set.
+
+    Returns:
+        playlist_name: A string that is a month prior to ending_date.
+    """
+
+    # Determine the playlist's date from the ending date if not supplied.
+    if not playlist_date:
+        playlist_date = generate_playlist_date(ending_date=ending_date)
 
     # Choose which format is used for name generation.
     if month_format == 'short':
-        playlist_name = playlist_date.strftime('%b %Y')
+        month_names = _MONTHS_SHORT
     else:
-        playlist_name = playlist_date.strftime('%B %Y')
+        month_names = _MONTHS_LONG
+    month_name = month_names[playlist_date.month - 1]
+    playlist_name = f'{month_name} {playlist_date.year}'
 
     return playlist_name
 
 
-def check_if_playlist_exists(playlist_name='', spotify_data=None,
-                             copies_allowed=False):
-    """Check if the user already has a playlist with the supplied name.
+def get_existing_playlists(spotify_data=None, cache_path=None,
+                           cache_lifetime=43200):
+    """Get the names of all the user's playlists, reusing a recent cache.
 
     Args:
-        playlist_name: A string with the name of the playlist to check for.
         spotify_data: A Spotify object containing the user's Spotify data.
+        cache_path: A path to cache the playlist names at, if there is one.
+        cache_lifetime: The number of seconds that a cache remains valid for.
+
+    Returns:
+        existing_playlists: A set of the names of the user's playlists.
     """
 
     # Catch the case where no spotify data is supplied.
     if not spotify_data:
         raise ValueError('No Spotify data supplied!')
 
-    # Extract the user's existing playlists using list comprehension.
-    existing_playlists = [playlist['name'] for playlist in
-                          spotify_data.current_user_playlists()['items']]
+    # Use the cached playlist names if they are recent enough, fetching them
+    # again if the cache cannot be read.
+    if (cache_path and os.path.exists(cache_path)
+            and time.time() - os.path.getmtime(cache_path) < cache_lifetime):
+        try:
+            with open(cache_path) as cache_file:
+                return set(json.load(cache_file))
+        except (OSError, TypeError, ValueError):
+            pass
+
+    # Get the first page, which also reveals how many playlists exist.
+    playlists = retry_spotify_request(
+        spotify_data.current_user_playlists, limit=50)
+    existing_playlists = {playlist['name'] for playlist in playlists['items']}
+
+    # Fetch any remaining pages concurrently rather than one after another.
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        pages = executor.map(
+            lambda offset: retry_spotify_request(
+                spotify_data.current_user_playlists,
+                limit=50, offset=offset)['items'],
+            range(50, playlists['total'], 50))
+        existing_playlists.update(playlist['name'] for page in pages
+                                  for playlist in page)
+
+    # Cache the playlist names for any other runs in the near future, writing
+    # to a temporary file first so that a killed run never leaves half a cache.
+    if cache_path:
+        cache_directory = os.path.dirname(cache_path) or '.'
+        os.makedirs(cache_directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+                'w', dir=cache_directory, suffix='.tmp',
+                delete=False) as cache_file:
+            json.dump(sorted(existing_playlists), cache_file)
+        os.replace(cache_file.name, cache_path)
+
+    return existing_playlists
+
+
+def clear_cache(cache_path=None):
+    """Delete a cache file so that its data is fetched again on the next run.
+
+    Args:
+        cache_path: A path to the cache file that should be deleted.
+    """
+
+    # Only delete the cache if there is one.
+    if cache_path and os.path.exists(cache_path):
+        os.remove(cache_path)
+
+
+def check_if_playlist_exists(playlist_name='', spotify_data=None,
+                             copies_allowed=False, cache_path=None):
+    """Check if the user already has a playlist with the supplied name.
+
+    Args:
+        playlist_name: A string with the name of the playlist to check for.
+        spotify_data: A Spotify object containing the user's Spotify data.
+        cache_path: A path to cache the user's playlist names at, if any.
+    """
+
+    # Get the names of all the user's existing playlists.
+    existing_playlists = get_existing_playlists(
+        spotify_data=spotify_data,
+        cache_path=cache_path)
 
     # Determine if a playlist should be made.
     if playlist_name in existing_playlists:
         exist_output = f'{playlist_name} found on Spotify!'
         if copies_allowed:
-            print('\nWarning: ' + exist_output +
+            print(f'\nWarning: {exist_output}'
                   f'\nCreating another {playlist_name} playlist.\n')
         else:
             raise ValueError(exist_output)
@@ -251,13 +496,14 @@ def get_most_played_tracks(spotify_data=None, tracks_total=50):
     # Ensure the tracks total supplied is valid.
     if tracks_total is None or tracks_total < 1 or tracks_total > 50:
         tracks_total = 50
-        print('An invalid number of tracks has been requested!\n' +
+        print('An invalid number of tracks has been requested!\n'
               f'Switched to the default request of {tracks_total} tracks.')
 
     # Extract all Spotify track ID's using list comprehension.
-    most_played_tracks = [track['uri'] for track in spotify_data.
-                         current_user_top_tracks(time_range='short_term',
-                                                 limit=tracks_total)['items']]
+    most_played_tracks = [track['uri'] for track in retry_spotify_request(
+                          spotify_data.current_user_top_tracks,
+                          time_range='short_term',
+                          limit=tracks_total)['items']]
 
     # The number of tracks returned could be less than the requested total.
     print('A total of', len(most_played_tracks), 'songs have been selected.')
@@ -267,7 +513,7 @@ def get_most_played_tracks(spotify_data=None, tracks_total=50):
 
 def generate_spotify_playlist(tracks=None, spotify_data=None,
                               ending_date=None, month_format='short',
-                              playlist_public=True):
+                              playlist_public=True, user_id=None):
     """Create a Spotify playlist of the user's currently most played tracks.
 
     Args:
@@ -275,64 +521,64 @@ def generate_spotify_playlist(tracks=None, spotify_data=None,
         spotify_data: A Spotify object containing the user's Spotify data.
         ending_date: The end date that the function is being run for.
         title_format: A string determining the playlist's title format.
+        user_id: The user's Spotify ID, which is fetched if not supplied.
     """
 
-    # Catch the case where no list of tracks is supplied.
-    if not tracks:
-        raise ValueError('No list of tracks supplied!')
-    
-    # Catch the case where no Spotify data is supplied.
-    if not spotify_data:
-        raise ValueError('No Spotify data supplied!')
-
-    # Catch the case where no ending date is supplied.
-    ending_date = ending_date or date.today()
+    # Catch the case where any required input is not supplied.
+    for required_input, input_name in ((tracks, 'list of tracks'),
+                                       (spotify_data, 'Spotify data')):
+        if not required_input:
+            raise ValueError(f'No {input_name} supplied!')
 
     # Determine the start of the playlist's description.
     tracks_total = len(tracks)
     if tracks_total == 1:
         description = 'My top most played song of '
     else:
-        description = 'My top ' + str(tracks_total) + ' most played songs of '
+        description = f'My top {tracks_total} most played songs of '
 
-    # Get playlist name formats (both are required).
+    # Get playlist name formats (both are required) from a single date.
+    playlist_date = generate_playlist_date(
+        ending_date=ending_date)
     name_short = generate_playlist_name(
-        ending_date=ending_date,
+        playlist_date=playlist_date,
         month_format='short')
     name_long = generate_playlist_name(
-        ending_date=ending_date,
+        playlist_date=playlist_date,
         month_format='long')
 
     # Determine the description's name format.
     if month_format == 'short':
-        name_for_title = name_short
-        print('The month will be titled in short form.')
+        name_for_title, title_form = name_short, 'short'
     else:
-        name_for_title = name_long
-        print('The month will be titled in long form.')
+        name_for_title, title_form = name_long, 'long'
 
     # Generate the description for the playlist.
-    description = (description
-                   + name_long
-                   + '. Auto-generated with AMMO. Visit '
-                   + 'https://github.com/JayMassey98'
-                   + ' for more information.')
+    description = f'{description}{name_long}{_DESCRIPTION_SUFFIX}'
     
-    # Generate the playlist and obtain its resulting ID.
-    playlist_id = spotify_data.user_playlist_create(
-        user=spotify_data.current_user()['id'],
+    # Generate the playlist and obtain its resulting ID. A server error may
+    # come after the playlist was made, so only rate limits are retried.
+    playlist_id = retry_spotify_request(
+        spotify_data.user_playlist_create,
+        user=user_id or retry_spotify_request(spotify_data.current_user)['id'],
         name=name_for_title,
         public=playlist_public,
-        description=description
+        description=description,
+        server_errors=False
         )['id']
-    print('Generating a playlist for ' + name_long + '.')
+    print(f'The month will be titled in {title_form} form.\n'
+          f'Generating a playlist for {name_long}.')
 
-    # Add the tracks to the playlist.
-    spotify_data.playlist_add_items(
-        playlist_id=playlist_id,
-        items=tracks)
-    print('\nPlaylist successfully pushed to Spotify:')
-    print('spotify:playlist:' + playlist_id)
+    # Add the tracks to the playlist (the API accepts up to 100 per request),
+    # again without retrying server errors so no track is added twice.
+    for index in range(0, tracks_total, 100):
+        retry_spotify_request(
+            spotify_data.playlist_add_items,
+            playlist_id=playlist_id,
+            items=tracks[index:index + 100],
+            server_errors=False)
+    print('\nPlaylist successfully pushed to Spotify:\n'
+          f'spotify:playlist:{playlist_id}')
 
 
 def main():
@@ -343,26 +589,41 @@ def main():
     # Output the title of the script into the console.
     print('Automated Monthly Music Organiser (AMMO)\n')
 
-    # Perform required setup.
-    set_environment_variables()
+    # Perform required setup, only asking for credentials on real runs.
     args = get_optional_arguments()
+    if not args.dry_run:
+        set_environment_variables()
 
     # Check the Spotify API can be reached.
     check_connection(
         url='https://api.spotify.com',
         dry_run=args.dry_run)
         
-    # Get the playlist requirements.
+    # Get the playlist requirements, reading today's date only once.
     spotify_data = get_spotify_data(
         dry_run=args.dry_run)
+    ending_date = date.today()
     playlist_name = generate_playlist_name(
+        ending_date=ending_date,
         month_format=args.month_format)
 
+    # Fetch the user's profile first, on its own, so that any sign in happens
+    # once before other requests (including concurrent ones) are made.
+    user_id = retry_spotify_request(spotify_data.current_user)['id']
+
+    # Only cache the user's playlist names for real runs, keeping each user's
+    # names apart so that switching accounts never reads the wrong ones.
+    cache_path = (None if args.dry_run else
+                  os.path.join(CACHE_DIRECTORY, f'playlists_{user_id}.json'))
+    if args.force_refresh:
+        clear_cache(cache_path=cache_path)
+
     # Stop the script if the playlist already exists.
     check_if_playlist_exists(
         playlist_name=playlist_name,
         spotify_data=spotify_data,
-        copies_allowed=args.copies_allowed)
+        copies_allowed=args.copies_allowed,
+        cache_path=cache_path)
 
     # Get the user's recently most played tracks.
     most_played_tracks = get_most_played_tracks(
@@ -373,8 +634,13 @@ def main():
     generate_spotify_playlist(
         tracks=most_played_tracks,
         spotify_data=spotify_data,
+        ending_date=ending_date,
         month_format=args.month_format,
-        playlist_public=args.playlist_public)
+        playlist_public=args.playlist_public,
+        user_id=user_id)
+
+    # The user's playlists have changed, so the cached names are now stale.
+    clear_cache(cache_path=cache_path)
 
 
 # Run if called directly.
@@ -1,8 +1,9 @@
 """A collection of Pytest hooks that are used by all test_*.py files.
 
 Outline:
-    The only hook that currently exists here is pytest_sessionfinish.
-    This hook is used to output the console text from testing main().
+    The spotify_client fixture shares one mock Spotify client between tests.
+    The block_network fixture stops any test from reaching the real internet.
+    The pytest_sessionfinish hook outputs the console text from testing main().
 
 References:
     https://docs.pytest.org/en/7.2.x/reference/ for Pytest API info.
@@ -10,17 +11,40 @@ References:
 
 # Built-In Libraries
 import shutil
+import socket
 
 # External Libraries
+from mock_ammo import mock_SpotifyOAuth
+import pytest
 import test_ammo
 
 
+# A mock Spotify client, created once and shared by every test that uses it.
+@pytest.fixture(scope='session')
+def spotify_client():
+    return mock_SpotifyOAuth().client
+
+
+# Fail fast if any test attempts a real connection, instead of waiting on it.
+@pytest.fixture(autouse=True)
+def block_network(monkeypatch):
+    def blocked(*args, **kwargs):
+        raise RuntimeError('Network access is disabled during tests!')
+    monkeypatch.setattr(socket, 'getaddrinfo', blocked)
+    monkeypatch.setattr(socket.socket, 'connect', blocked)
+
+
 # Called once all tests are done.
-def pytest_sessionfinish():
+def pytest_sessionfinish(session, exitstatus):
+
+    # Exit if main() was not tested, such as when only some tests are run.
+    main_console_output = getattr(test_ammo, 'main_console_output', None)
+    if main_console_output is None:
+        return
 
     # Determine if there is any text from the console.
-    output = test_ammo.main_console_output.out.strip()
-    error = test_ammo.main_console_output.err.strip()
+    output = main_console_output.out.strip()
+    error = main_console_output.err.strip()
     
     # Exit if there is no text.
     if not output and not error:
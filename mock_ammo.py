@@ -8,36 +8,59 @@ References:
     https://developer.spotify.com/documentation/web-api/ for Spotify API info.
 """
 
+# Built-In Libraries
+from types import MappingProxyType
+
 
 # ----------------
 # Mock Spotify API
 # ----------------
 
 
+# A lazy page of mock tracks, creating a separate track for each item.
+class mock_TrackPage():
+    __slots__ = ('total',)
+    def __init__(self, total):
+        self.total = total
+    def __iter__(self):
+        return ({'uri': f'track_id_{index}'} for index in range(self.total))
+    def __len__(self):
+        return self.total
+
+
 # A mock Spotify client emulating API functionality.
 class mock_SpotifyClient():
+    __slots__ = ()
+    _USER = MappingProxyType({'id': 'user_id'})
+    _PLAYLISTS = MappingProxyType({
+        'items': (MappingProxyType({'name': 'existing_playlist'}),),
+        'total': 1})
+    _USER_PLAYLISTS = MappingProxyType({
+        'items': (MappingProxyType({'id': 'mock_playlist_uri_code'}),)})
+    _CREATED_PLAYLIST = MappingProxyType({'id': 'mock_playlist_uri_code'})
     def user(self):
         return 'mock_user'
     def current_user(self):
-        return {'id': 'user_id'}
-    def current_user_playlists(self):
-        return {'items': [{'name': 'existing_playlist'}]}
+        return self._USER
+    def current_user_playlists(self, limit=50, offset=0):
+        return self._PLAYLISTS
     def current_user_top_tracks(self, time_range, limit):
-        return {'items': [{'uri': 'track_id'}] * limit}
+        return {'items': mock_TrackPage(limit)}
     def user_playlists(self, user):
-        return {'items': [{'id': 'mock_playlist_uri_code'}]}
+        return self._USER_PLAYLISTS
     def user_playlist_create(self, user, name, public, description):
-        return {'id': 'mock_playlist_uri_code'}
+        return self._CREATED_PLAYLIST
     def playlist_add_items(self, playlist_id, items):
         pass
 
 
 # A mock Spotify authentication for the client API.
 class mock_SpotifyOAuth(mock_SpotifyClient):
+    __slots__ = ('client',)
     def __init__(self, *args, **kwargs):
         self.client = mock_SpotifyClient()
 
 
 # A mock Spotify entry point for the Spotipy code.
 class mock_Spotify(mock_SpotifyOAuth):
-    pass
\ No newline at end of file
+    __slots__ = ()
\ No newline at end of file
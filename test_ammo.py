@@ -2,8 +2,7 @@
 a Spotify playlist containing a user's most played songs of the previous month.
 
 Usage:
-    cmd /c 'pytest -v --no-header ../test_ammo.py & pytest -v --no-header
-    ../test_ammo.py > ../test_ammo.log'
+    pytest -v --no-header ../test_ammo.py | tee ../test_ammo.log
 
 Outline:
     Runs through each function, testing various possible cases for each.
@@ -13,10 +12,63 @@ References:
     https://developer.spotify.com/documentation/web-api/ for Spotify API info.
 """
 
+# Built-In Libraries
+from datetime import date, datetime, timedelta, timezone
+from email.utils import format_datetime
+from functools import lru_cache
+import os
+import re
+import sys
+
 # External Libraries
-from ammo import *
-from mock_ammo import *
+from ammo import (
+    _PROBE_SESSION,
+    _SESSION,
+    check_connection,
+    check_if_playlist_exists,
+    clear_cache,
+    generate_playlist_name,
+    generate_spotify_playlist,
+    get_existing_playlists,
+    get_missing_environment_variables,
+    get_most_played_tracks,
+    get_optional_arguments,
+    get_retry_after,
+    get_spotify_data,
+    main,
+    retry_spotify_request,
+    set_environment_variables)
+from mock_ammo import mock_Spotify, mock_SpotifyClient
 import pytest
+import requests
+import spotipy
+
+
+# ------------
+# test_session
+# ------------
+
+
+# Test the shared session never retries a write, which could duplicate it.
+@pytest.mark.parametrize('status_code', [429, 500, 502, 503, 504])
+def test_session_does_not_retry_posts(status_code):
+    retry = _SESSION.get_adapter('https://api.spotify.com').max_retries
+    assert not retry.is_retry('POST', status_code, has_retry_after=True)
+
+
+# Test the shared session leaves rate limits and server errors to the helper.
+@pytest.mark.parametrize('status_code', [429, 500, 502, 503, 504])
+def test_session_does_not_retry_statuses(status_code):
+    retry = _SESSION.get_adapter('https://api.spotify.com').max_retries
+    assert not retry.is_retry('GET', status_code, has_retry_after=True)
+
+
+# Test the connection check never retries, so it is bounded by its timeout.
+def test_probe_session_does_not_retry():
+    retry = _PROBE_SESSION.get_adapter('https://api.spotify.com').max_retries
+    assert retry.total == 0
+    assert not retry.is_retry('HEAD', 429, has_retry_after=True)
+
 
 
 # --------------------------------------
@@ -66,120 +118,500 @@ def test_set_environment_variables_none_set(monkeypatch):
     assert os.environ['SPOTIPY_REDIRECT_URI'] == 'test_redirect_uri'
 
 
+# Test the script stops if the environment variables cannot be prompted for.
+def test_set_environment_variables_no_input(monkeypatch, capsys):
+
+    # Delete an environment variable and mock an empty input stream.
+    monkeypatch.delenv('SPOTIPY_CLIENT_ID', raising=False)
+    def mock_input(prompt):
+        raise EOFError
+    monkeypatch.setattr('builtins.input', mock_input)
+
+    # Assert the script halts rather than waiting for input.
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        set_environment_variables()
+    assert pytest_wrapped_e.value.code == 1
+
+    # Pytest provided 'capsys' allows capturing console prints.
+    output, error = capsys.readouterr()
+    assert output.endswith('\nError: SPOTIPY_CLIENT_ID must be set when there is no input.\n')
+    assert error == ''
+
+
+# Test the missing environment variables are found without any prompts.
+def test_get_missing_environment_variables(monkeypatch):
+
+    # Only delete one of the environment variables.
+    monkeypatch.setenv('SPOTIPY_CLIENT_ID', 'test_client_id')
+    monkeypatch.setenv('SPOTIPY_CLIENT_SECRET', 'test_client_secret')
+    monkeypatch.delenv('SPOTIPY_REDIRECT_URI', raising=False)
+    monkeypatch.setattr('builtins.input', lambda prompt: pytest.fail('Prompted!'))
+
+    # Assert that only the deleted environment variable is missing.
+    assert get_missing_environment_variables() == {
+        'SPOTIPY_REDIRECT_URI': 'Redirect URI: '}
+
+
+
+# ---------------------------
+# test_get_optional_arguments
+# ---------------------------
+
+
+# Test the arguments default correctly when none are supplied.
+def test_get_optional_arguments_defaults(monkeypatch):
+    monkeypatch.setattr('sys.argv', ['ammo.py'])
+    args = get_optional_arguments()
+    assert args.month_format == 'short'
+    assert args.tracks_total == 50
+    assert args.playlist_public
+    assert not args.dry_run
+
+
+# Test invalid arguments are rejected when they are parsed.
+@pytest.mark.parametrize('arguments', [['--month_format', 'medium'],
+                                       ['--tracks_total', '0'],
+                                       ['--tracks_total', '51']])
+def test_get_optional_arguments_invalid(monkeypatch, arguments):
+    monkeypatch.setattr('sys.argv', ['ammo.py'] + arguments)
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        get_optional_arguments()
+    assert pytest_wrapped_e.value.code == 2
+
+
 
 # ---------------------
 # test_check_connection
 # ---------------------
 
 
-# Test nothing happens if the received URL status code is 400.
-def test_check_connection_returned_400_code(capfd):
-    
+# Test nothing happens if the URL is reached successfully.
+def test_check_connection_secured(monkeypatch, capsys):
+
+    # Mock a request that receives a successful status code.
+    def mock_head(url, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        return response
+    monkeypatch.setattr('ammo._PROBE_SESSION.head', mock_head)
+
     # Assert a connection can be established.
     url = 'https://api.spotify.com'
     assert check_connection(url) == None
 
-    # Pytest provided 'capfd' allows capturing console prints.
-    output, error = capfd.readouterr()
+    # Pytest provided 'capsys' allows capturing console prints.
+    output, error = capsys.readouterr()
     assert output == ('Secured a https://api.spotify.com link.\n')
     assert error == ''
 
 
+# Test the URL is tried again after waiting if it is rate limited.
+def test_check_connection_rate_limited(monkeypatch, capsys):
+
+    # Mock a request that is rate limited once before succeeding.
+    status_codes = [200, 429]
+    def mock_head(url, **kwargs):
+        response = requests.Response()
+        response.status_code = status_codes.pop()
+        response.headers['Retry-After'] = '2'
+        return response
+    monkeypatch.setattr('ammo._PROBE_SESSION.head', mock_head)
+
+    # Record the sleeps instead of actually waiting.
+    sleeps = []
+    monkeypatch.setattr('time.sleep', sleeps.append)
+    monkeypatch.setattr('random.random', lambda: 0)
+
+    # Assert a connection can be established after one wait.
+    url = 'https://api.spotify.com'
+    assert check_connection(url) == None
+    assert sleeps == [2.0]
+
+    # Pytest provided 'capsys' allows capturing console prints.
+    output, error = capsys.readouterr()
+    assert output == ('Secured a https://api.spotify.com link.\n')
+    assert error == ''
+
+
+# Test the script stops if the URL is still rate limited after every attempt.
+def test_check_connection_still_rate_limited(monkeypatch, capsys):
+
+    # Mock a request that is always rate limited.
+    def mock_head(url, **kwargs):
+        response = requests.Response()
+        response.status_code = 429
+        return response
+    monkeypatch.setattr('ammo._PROBE_SESSION.head', mock_head)
+
+    # Record the sleeps instead of actually waiting.
+    sleeps = []
+    monkeypatch.setattr('time.sleep', sleeps.append)
+
+    # Assert a connection cannot be established.
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        check_connection('https://api.spotify.com', attempts=3)
+    assert pytest_wrapped_e.value.code == 1
+    assert len(sleeps) == 2
+
+    # Pytest provided 'capsys' allows capturing console prints.
+    output, error = capsys.readouterr()
+    assert output.startswith('Too Many Requests:')
+    assert error == ''
+
+
+# Test the script stops if the received URL status code is 400.
+def test_check_connection_returned_400_code(monkeypatch, capsys):
+
+    # Mock a request that receives a bad request status code.
+    def mock_head(url, **kwargs):
+        response = requests.Response()
+        response.status_code = 400
+        return response
+    monkeypatch.setattr('ammo._PROBE_SESSION.head', mock_head)
+
+    # Assert a connection cannot be established.
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        check_connection('https://api.spotify.com')
+    assert pytest_wrapped_e.value.code == 1
+
+    # Pytest provided 'capsys' allows capturing console prints.
+    output, error = capsys.readouterr()
+    assert output == ('Bad Request: The request could not be understood or was '
+                      'missing required parameters.\n')
+    assert error == ''
+
+
 # Test the script stops if a non-400 status code is received.
-def test_check_connection_unknown_error_code(capfd):
+def test_check_connection_unknown_error_code(capsys):
     
     # Assert a connection cannot be established.
     url = 'error'
     with pytest.raises(SystemExit) as pytest_wrapped_e:
         check_connection(url)
-    assert pytest_wrapped_e.type == SystemExit
     assert pytest_wrapped_e.value.code == 1
 
-    # Pytest provided 'capfd' allows capturing console prints.
-    output, error = capfd.readouterr()
+    # Pytest provided 'capsys' allows capturing console prints.
+    output, error = capsys.readouterr()
     assert output == ('Error: An unknown error occurred when attempting to reach error.\n')
     assert error == '' # No system error here, as the resulting behavior above is expected.
 
 
+# Test the script stops if the URL takes too long to respond.
+def test_check_connection_timed_out(monkeypatch, capsys):
+
+    # Mock a request that times out.
+    def mock_head(url, **kwargs):
+        raise requests.exceptions.Timeout
+    monkeypatch.setattr('ammo._PROBE_SESSION.head', mock_head)
+
+    # Assert a connection cannot be established.
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        check_connection('https://api.spotify.com')
+    assert pytest_wrapped_e.value.code == 1
+
+    # Pytest provided 'capsys' allows capturing console prints.
+    output, error = capsys.readouterr()
+    assert output == 'Error: Timed out when attempting to reach https://api.spotify.com.\n'
+    assert error == ''
+
+
+# Test the script stops if an undescribed error status code is received.
+def test_check_connection_undescribed_error_code(monkeypatch, capsys):
+
+    # Mock a request that receives a status code with no description.
+    def mock_head(url, **kwargs):
+        response = requests.Response()
+        response.status_code = 418
+        return response
+    monkeypatch.setattr('ammo._PROBE_SESSION.head', mock_head)
+
+    # Assert a connection cannot be established.
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        check_connection('https://api.spotify.com')
+    assert pytest_wrapped_e.value.code == 1
+
+    # Pytest provided 'capsys' allows capturing console prints.
+    output, error = capsys.readouterr()
+    assert output == ('Error: Received a 418 status code when attempting to '
+                      'reach https://api.spotify.com.\n')
+    assert error == ''
+
+
+# ---------------------
+# test_get_spotify_data
+# ---------------------
+
+
+# Test the same Spotify data is reused rather than authenticating again.
+def test_get_spotify_data_is_reused():
+
+    # Assert repeated dry runs return the same mock object.
+    spotify_data = get_spotify_data(dry_run=True)
+    assert isinstance(spotify_data, mock_Spotify)
+    assert get_spotify_data(dry_run=True) is spotify_data
+
+
+# --------------------------
+# test_retry_spotify_request
+# --------------------------
+
+
+# Test a rate limited request is retried after the time Spotify asks for.
+def test_retry_spotify_request_rate_limited(monkeypatch):
+
+    # Mock a request that is rate limited once before succeeding.
+    responses = [spotipy.SpotifyException(429, -1, 'Too many requests',
+                                          headers={'Retry-After': '2'}),
+                 'response']
+    def mock_request():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    # Record the sleeps instead of actually waiting.
+    sleeps = []
+    monkeypatch.setattr('time.sleep', sleeps.append)
+    assert retry_spotify_request(mock_request) == 'response'
+    assert sleeps == [2.0]
+
+
+# Test a rate limited request never waits longer than a minute.
+def test_retry_spotify_request_long_retry_after(monkeypatch):
+
+    # Mock a request that asks for an hour's wait before succeeding.
+    responses = [spotipy.SpotifyException(429, -1, 'Too many requests',
+                                          headers={'Retry-After': '3600'})]
+    def mock_request():
+        if responses:
+            raise responses.pop()
+        return 'response'
+
+    # Record the sleeps instead of actually waiting.
+    sleeps = []
+    monkeypatch.setattr('time.sleep', sleeps.append)
+    assert retry_spotify_request(mock_request) == 'response'
+    assert sleeps == [60]
+
+
+# Test a request is retried with a backoff if Spotify is unavailable.
+def test_retry_spotify_request_server_error(monkeypatch):
+
+    # Mock a request that fails twice before succeeding.
+    responses = [spotipy.SpotifyException(503, -1, 'Service unavailable')] * 2
+    def mock_request():
+        if responses:
+            raise responses.pop()
+        return 'response'
+
+    # Record the sleeps instead of actually waiting, without any jitter.
+    sleeps = []
+    monkeypatch.setattr('time.sleep', sleeps.append)
+    monkeypatch.setattr('random.random', lambda: 0.5)
+    assert retry_spotify_request(mock_request) == 'response'
+    assert sleeps == [1.5, 2.5]
+
+
+# Test server errors are raised without retrying when they are not allowed.
+def test_retry_spotify_request_server_error_on_write(monkeypatch):
+    calls = []
+    def mock_request():
+        calls.append('request')
+        raise spotipy.SpotifyException(503, -1, 'Service unavailable')
+    monkeypatch.setattr('time.sleep', lambda seconds: None)
+    with pytest.raises(spotipy.SpotifyException):
+        retry_spotify_request(mock_request, server_errors=False)
+    assert calls == ['request']
+
+
+# Test writes are still retried when they are rate limited.
+def test_retry_spotify_request_rate_limited_on_write(monkeypatch):
+    responses = [spotipy.SpotifyException(429, -1, 'Too many requests',
+                                          headers={'Retry-After': '2'})]
+    def mock_request():
+        if responses:
+            raise responses.pop()
+        return 'response'
+    sleeps = []
+    monkeypatch.setattr('time.sleep', sleeps.append)
+    assert retry_spotify_request(mock_request, server_errors=False) == 'response'
+    assert sleeps == [2.0]
+
+
+# Test client errors are raised without retrying.
+def test_retry_spotify_request_other_error(monkeypatch):
+    def mock_request():
+        raise spotipy.SpotifyException(404, -1, 'Not found')
+    monkeypatch.setattr('time.sleep', lambda seconds: pytest.fail('Retried!'))
+    with pytest.raises(spotipy.SpotifyException):
+        retry_spotify_request(mock_request)
+
+
+
+# --------------------
+# test_get_retry_after
+# --------------------
+
+
+# Test the wait is read from a Retry-After header given as a HTTP date.
+def test_get_retry_after_http_date():
+    retry_date = datetime.now(timezone.utc) + timedelta(seconds=30)
+    error = spotipy.SpotifyException(429, -1, 'Too many requests',
+                                     headers={'Retry-After': format_datetime(retry_date, usegmt=True)})
+    assert 28 < get_retry_after(error) <= 30
+
+
+# Test the wait defaults to a second if the Retry-After header is unreadable.
+@pytest.mark.parametrize('headers', [None, {}, {'Retry-After': 'soon'},
+                                     {'Retry-After': 'nan'},
+                                     {'Retry-After': 'inf'}])
+def test_get_retry_after_unreadable(headers):
+    error = spotipy.SpotifyException(429, -1, 'Too many requests', headers=headers)
+    assert get_retry_after(error) == 1
+
+
 
 # ---------------------------
 # test_generate_playlist_name
 # ---------------------------
 
 
-# Test generating the playlist name when the current month is January.
-def test_generate_playlist_name_for_january():
-    ending_date = date(2023, 1, 1)
-    playlist_date = ending_date.replace(year=2022, month=12)
-    expected_playlist_name = playlist_date.replace(year=2022, month=12).strftime('%b %Y')
-    generated_playlist_name = generate_playlist_name(ending_date=ending_date, month_format = 'short')
-    assert generated_playlist_name == expected_playlist_name
+# The expected name of a playlist for a given month, in either format.
+@lru_cache(maxsize=None)
+def _expected_name(year, month, month_format='short'):
+    return date(year, month, 1).strftime('%b %Y' if month_format == 'short' else '%B %Y')
 
 
-# Test generating the playlist name when the current month is not January.
-def test_generate_playlist_name_not_january(month=2):
-    ending_date = date(2023, month, 1)
-    playlist_date = ending_date.replace(month=month-1)
-    expected_playlist_name = playlist_date.replace(month=month-1).strftime('%b %Y')
+# Test generating the playlist name for the month before each month in the year.
+@pytest.mark.parametrize('ending_month, year, month',
+                         [(1, 2022, 12)] + [(month + 1, 2023, month) for month in range(1, 12)])
+def test_generate_playlist_name_all_months(ending_month, year, month):
+    ending_date = date(2023, ending_month, 1)
+    expected_playlist_name = _expected_name(year, month)
     generated_playlist_name = generate_playlist_name(ending_date=ending_date, month_format = 'short')
     assert generated_playlist_name == expected_playlist_name
 
 
-# Test generating the playlist name for all months in the year.
-def test_generate_playlist_name_all_months():
-
-    # Test once for each month in the year.
-    test_generate_playlist_name_for_january()
-    for month in range(1, 12):
-        test_generate_playlist_name_not_january(month + 1)
+# Test generating the playlist name at the end of a longer month.
+def test_generate_playlist_name_end_of_month():
+    ending_date = date(2023, 3, 31)
+    generated_playlist_name = generate_playlist_name(ending_date=ending_date, month_format = 'short')
+    assert generated_playlist_name == 'Feb 2023'
 
 
 # Test generating the playlist name without any abbreviation.
 def test_generate_playlist_name_long_format(month=2):
     ending_date = date(2023, month, 1)
-    playlist_date = ending_date.replace(month=month-1)
-    expected_playlist_name = playlist_date.replace(month=month-1).strftime('%B %Y')
+    expected_playlist_name = _expected_name(2023, month - 1, month_format='long')
     generated_playlist_name = generate_playlist_name(ending_date=ending_date, month_format = 'long')
     assert generated_playlist_name == expected_playlist_name
 
 
 
+# ---------------------------
+# test_get_existing_playlists
+# ---------------------------
+
+
+# Test the function caches the playlist names it fetches.
+def test_get_existing_playlists_writes_cache(tmp_path, spotify_client):
+    cache_path = str(tmp_path / 'playlists.json')
+    existing_playlists = get_existing_playlists(spotify_data=spotify_client,
+                                                cache_path=cache_path)
+    assert existing_playlists == {'existing_playlist'}
+    assert os.path.exists(cache_path)
+
+
+# Test the function uses a recent cache instead of calling Spotify.
+def test_get_existing_playlists_reads_cache(tmp_path, spotify_client):
+
+    # Mock a client that fails if any playlists are requested.
+    class mock_OfflineSpotifyClient(mock_SpotifyClient):
+        def current_user_playlists(self, limit=50, offset=0):
+            raise AssertionError('Spotify was called despite a cache!')
+
+    # Create a cache before running the function.
+    cache_path = str(tmp_path / 'playlists.json')
+    get_existing_playlists(spotify_data=spotify_client,
+                           cache_path=cache_path)
+    existing_playlists = get_existing_playlists(
+        spotify_data=mock_OfflineSpotifyClient(),
+        cache_path=cache_path)
+    assert existing_playlists == {'existing_playlist'}
+
+
+# Test the function ignores a cache that is too old.
+def test_get_existing_playlists_expired_cache(tmp_path, spotify_client):
+    cache_path = tmp_path / 'playlists.json'
+    cache_path.write_text('["old_playlist"]')
+    existing_playlists = get_existing_playlists(
+        spotify_data=spotify_client,
+        cache_path=str(cache_path),
+        cache_lifetime=0)
+    assert existing_playlists == {'existing_playlist'}
+
+
+# Test the function fetches the playlist names again if the cache is corrupt.
+@pytest.mark.parametrize('cache_text', ['["existing_pla', '1'])
+def test_get_existing_playlists_corrupt_cache(tmp_path, spotify_client, cache_text):
+    cache_path = tmp_path / 'playlists.json'
+    cache_path.write_text(cache_text)
+    existing_playlists = get_existing_playlists(
+        spotify_data=spotify_client,
+        cache_path=str(cache_path))
+    assert existing_playlists == {'existing_playlist'}
+    assert cache_path.read_text() == '["existing_playlist"]'
+    assert os.listdir(tmp_path) == ['playlists.json']
+
+
+# Test clearing a cache deletes it, and does nothing if it does not exist.
+def test_clear_cache(tmp_path):
+    cache_path = tmp_path / 'playlists.json'
+    cache_path.write_text('[]')
+    clear_cache(cache_path=str(cache_path))
+    assert not cache_path.exists()
+    clear_cache(cache_path=str(cache_path))
+
+
+
 # -----------------------------
 # test_check_if_playlist_exists
 # -----------------------------
 
 
-# Test the function raises an exception when no spotify data is supplied.
-def test_check_if_playlist_exists_no_data():
-    with pytest.raises(ValueError) as expected_error:
-        check_if_playlist_exists()
-    assert str(expected_error.value) == 'No Spotify data supplied!'
-
-
 # Test the function raises an exception when the playlist already exists.
-def test_check_if_playlist_exists_is_true():
-    spotify_data = mock_SpotifyOAuth().client
-    with pytest.raises(ValueError) as expected_error:
-        check_if_playlist_exists(playlist_name='existing_playlist', spotify_data=spotify_data)
-    assert str(expected_error.value) == 'existing_playlist found on Spotify!'
+def test_check_if_playlist_exists_is_true(spotify_client):
+    with pytest.raises(ValueError, match='^existing_playlist found on Spotify!$'):
+        check_if_playlist_exists(playlist_name='existing_playlist', spotify_data=spotify_client)
 
 
 # Test the function does not raise an exception when the playlist does not already exist.
-def test_check_if_playlist_exists_is_false():
-    spotify_data = mock_SpotifyOAuth().client
-    check_if_playlist_exists(playlist_name='new_playlist', spotify_data=spotify_data)
-    assert True
+def test_check_if_playlist_exists_is_false(spotify_client):
+    check_if_playlist_exists(playlist_name='new_playlist', spotify_data=spotify_client)
+
+
+# Test the function raises an exception when the playlist is on a later page.
+def test_check_if_playlist_exists_on_later_page():
+
+    # Mock a client whose matching playlist is only on the last page.
+    class mock_PagedSpotifyClient(mock_SpotifyClient):
+        def current_user_playlists(self, limit=50, offset=0):
+            name = 'existing_playlist' if offset == 100 else 'new_playlist'
+            return {'items': [{'name': name}], 'total': 101}
+
+    spotify_data = mock_PagedSpotifyClient()
+    with pytest.raises(ValueError, match='^existing_playlist found on Spotify!$'):
+        check_if_playlist_exists(playlist_name='existing_playlist', spotify_data=spotify_data)
 
 
 # Test the function creates a duplicate playlist if it is allowed to do so.
-def test_check_if_playlist_exists_allowed(capfd):
-    spotify_data = mock_SpotifyOAuth().client
+def test_check_if_playlist_exists_allowed(capsys, spotify_client):
     check_if_playlist_exists(playlist_name='existing_playlist',
-                             spotify_data=spotify_data,
+                             spotify_data=spotify_client,
                              copies_allowed=True)
 
-    # Pytest provided 'capfd' allows capturing console prints.
-    output, error = capfd.readouterr()
+    # Pytest provided 'capsys' allows capturing console prints.
+    output, error = capsys.readouterr()
     assert output == ('\nWarning: existing_playlist found on Spotify!\n' +
                       'Creating another existing_playlist playlist.\n\n')
     assert error == ''
@@ -191,56 +623,31 @@ def test_check_if_playlist_exists_allowed(capfd):
 # ---------------------------
 
 
-# Test the function raises an exception when no spotify data is supplied.
-def test_get_most_played_tracks_no_data():
-    with pytest.raises(ValueError) as expected_error:
-        get_most_played_tracks()
-    assert str(expected_error.value) == 'No Spotify data supplied!'
-
-
 # Test the function returns a list of tracks.
-def test_get_most_played_tracks_from_data():
-    spotify_data = mock_SpotifyOAuth().client
-    most_played_tracks = get_most_played_tracks(
-        spotify_data=spotify_data)
-    assert type(most_played_tracks) is list
-
-
-# Test the function requests and receives 25 tracks.
-def test_get_most_played_tracks_25_tracks():
-    spotify_data = mock_SpotifyOAuth().client
-    tracks_total = 25
+def test_get_most_played_tracks_from_data(spotify_client):
     most_played_tracks = get_most_played_tracks(
-        spotify_data=spotify_data,
-        tracks_total=tracks_total)
-    assert len(most_played_tracks) == tracks_total
+        spotify_data=spotify_client)
+    assert isinstance(most_played_tracks, list)
 
 
-# Test the function requests and receives 50 tracks.
-def test_get_most_played_tracks_50_tracks():
-    spotify_data = mock_SpotifyOAuth().client
-    tracks_total = 50
+# Test the function receives the requested number of tracks, and defaults to
+# using 50 tracks if an invalid value is supplied.
+@pytest.mark.parametrize('tracks_total, expected_total, warned',
+                         [(0, 50, True), (1, 1, False), (25, 25, False),
+                          (50, 50, False), (51, 50, True), (100, 50, True)])
+def test_get_most_played_tracks_sizes(capsys, spotify_client, tracks_total,
+                                      expected_total, warned):
     most_played_tracks = get_most_played_tracks(
-        spotify_data=spotify_data,
+        spotify_data=spotify_client,
         tracks_total=tracks_total)
-    assert len(most_played_tracks) == tracks_total
-
-
-# Test the function defaults to using 50 tracks if an invalid value is supplied.
-def test_get_most_played_tracks_100_tracks(capfd):
-    spotify_data = mock_SpotifyOAuth().client
-    tracks_total = 100
-    most_played_tracks = get_most_played_tracks(
-        spotify_data=spotify_data,
-        tracks_total=tracks_total)
-    assert len(most_played_tracks) == 50
-
-    # Pytest provided 'capfd' allows capturing console prints.
-    output, error = capfd.readouterr()
-    assert output == ('An invalid number of tracks has been requested!\n' +
-                      'Switched to the default request of 50 tracks.\n' +
-                      'A total of 50 songs have been selected.\n')
- 
+    assert len(most_played_tracks) == expected_total
+
+    # Pytest provided 'capsys' allows capturing console prints.
+    output, error = capsys.readouterr()
+    warning = ('An invalid number of tracks has been requested!\n' +
+               'Switched to the default request of 50 tracks.\n') if warned else ''
+    assert output == (warning +
+                      f'A total of {expected_total} songs have been selected.\n')
     assert error == ''
     
 
@@ -250,36 +657,61 @@ def test_get_most_played_tracks_100_tracks(capfd):
 # ------------------------------
 
 
-# Test the function raises an exception when no list of tracks is supplied.
-def test_generate_spotify_playlist_no_tracks():
-    with pytest.raises(ValueError) as expected_error:
-        generate_spotify_playlist()
-    assert str(expected_error.value) == 'No list of tracks supplied!'
-
-
-# Test the function raises an exception when no Spotify data is supplied.
-def test_generate_spotify_playlist_no_data():
-    tracks = ['song_1', 'song_2', 'song_3']
-    with pytest.raises(ValueError) as expected_error:
-        generate_spotify_playlist(tracks=tracks)
-    assert str(expected_error.value) == 'No Spotify data supplied!'
-
-
 # Test generating Spotify playlists correctly.
-def test_generate_spotify_playlist_from_data():
+def test_generate_spotify_playlist_from_data(spotify_client):
 
     # Create mock inputs.
     tracks = ['song_1', 'song_2', 'song_3']
-    spotify_data = mock_SpotifyOAuth().client
     ending_date = date(2023, 2, 1)
 
     # Test the function can be called.
     generate_spotify_playlist(
         tracks=tracks,
-        spotify_data=spotify_data,
+        spotify_data=spotify_client,
         ending_date=ending_date)
 
 
+# Test tracks are added in batches that the Spotify API accepts.
+def test_generate_spotify_playlist_batches_tracks():
+
+    # Mock a client that records every batch of tracks added.
+    class mock_RecordingSpotifyClient(mock_SpotifyClient):
+        def __init__(self):
+            self.batches = []
+        def playlist_add_items(self, playlist_id, items):
+            self.batches.append(items)
+
+    # Create mock inputs.
+    tracks = ['song_' + str(number) for number in range(150)]
+    spotify_data = mock_RecordingSpotifyClient()
+
+    # Assert the tracks were split into batches of at most 100, in order.
+    generate_spotify_playlist(
+        tracks=tracks,
+        spotify_data=spotify_data,
+        ending_date=date(2023, 2, 1))
+    assert [len(batch) for batch in spotify_data.batches] == [100, 50]
+    assert sum(spotify_data.batches, []) == tracks
+
+
+
+# -------------------
+# test_missing_inputs
+# -------------------
+
+
+# Test each function raises an exception when a required input is not supplied.
+@pytest.mark.parametrize('function, kwargs, message', [
+    (get_existing_playlists, {}, 'No Spotify data supplied!'),
+    (check_if_playlist_exists, {}, 'No Spotify data supplied!'),
+    (get_most_played_tracks, {}, 'No Spotify data supplied!'),
+    (generate_spotify_playlist, {}, 'No list of tracks supplied!'),
+    (generate_spotify_playlist, {'tracks': ['song_1', 'song_2', 'song_3']},
+     'No Spotify data supplied!')])
+def test_missing_inputs(function, kwargs, message):
+    with pytest.raises(ValueError, match=f'^{re.escape(message)}$'):
+        function(**kwargs)
+
 
 # ---------
 # test_main
@@ -287,23 +719,17 @@ def test_generate_spotify_playlist_from_data():
 
 
 # Test all of ammo.py can run in its entirety.
-def test_main_start_to_finish_is_successful(capsys):
+def test_main_start_to_finish_is_successful(monkeypatch, capsys):
     
     # Allow conftest.py access to the output.
     global main_console_output
     main_console_output = capsys.readouterr()
-    
-    # Back up the real system arguments.
-    sys_argv_bak = sys.argv
 
-    # Mock all external dependencies in ammo.py.
-    sys.argv = ['ammo.py', '--dry_run', 'True']
+    # Mock all external dependencies in ammo.py, until the test is done.
+    monkeypatch.setattr(sys, 'argv', ['ammo.py', '--dry_run'])
     
     # Run the script.
-    main()
+    assert main() == None
 
     # Update the result of the console output.
-    main_console_output = capsys.readouterr()
-
-    # Reinstate the arguments.
-    sys.argv = sys_argv_bak
\ No newline at end of file
+    main_console_output = capsys.readouterr()
\ No newline at end of file